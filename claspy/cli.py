@@ -9,10 +9,13 @@
 # -------------------------------------------------------------------------------------------------
 
 from .db import CellosaurusDB
+from .result import SearchResult
 from .str_profile import Profile
-from argparse import ArgumentParser
-from claspy.db import CellosaurusDB
+from argparse import ArgumentParser, ArgumentTypeError
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 import claspy
+import csv
 import pandas as pd
 import sys
 
@@ -22,27 +25,60 @@ def main(arglist=None):
         arglist = map(str, arglist)
     args = get_parser().parse_args(arglist)
     db = CellosaurusDB.load(args.db)
-    all_summaries = list()
-    all_reports = list()
-    for query in Profile.load(args.query):
-        results = db.search(
-            query,
-            algorithm=args.algorithm,
-            mode=args.mode,
-            taxid=query.taxid,
-            amel=args.amel,
-            minscore=args.min_score,
-            maxhits=args.max_hits,
-        )
-        all_summaries.append(results.summary)
-        all_reports.append(results.full_report)
-    pd.concat(all_summaries).to_markdown(sys.stdout, index=False, floatfmt=".3f")
+    queries = list(Profile.load(args.query))
+    options = dict(
+        algorithm=args.algorithm,
+        mode=args.mode,
+        amel=args.amel,
+        minscore=args.min_score,
+        maxhits=args.max_hits,
+    )
+    if len(queries) > 1 and args.jobs > 1:
+        if db._by_taxid is None:
+            db.compile()
+        search = partial(search_query, **options)
+        with ProcessPoolExecutor(args.jobs, initializer=init_worker, initargs=(db,)) as executor:
+            results = list(executor.map(search, queries))
+    else:
+        results = [db.search(query, taxid=query.taxid, **options) for query in queries]
+    summary_rows = list()
+    all_markers = set()
+    for result in results:
+        summary_rows.extend(result.summary_rows())
+        all_markers.update(result.all_markers)
+    summary = pd.DataFrame(summary_rows, columns=SearchResult.SUMMARY_COLUMNS)
+    summary.to_markdown(sys.stdout, index=False, floatfmt=".3f")
     print("")
     if args.out:
-        pd.concat(all_reports).to_csv(args.out, index=False)
+        markers = sorted(all_markers)
+        with open(args.out, "w", newline="") as outstream:
+            writer = csv.writer(outstream, lineterminator="\n")
+            writer.writerow(SearchResult.REPORT_COLUMNS + markers)
+            for result in results:
+                writer.writerows(result.full_report_rows(markers))
         print(f"\nFull report written to {args.out}", file=sys.stderr)
 
 
+worker_db = None
+
+
+def init_worker(db):
+    """Make the database available to a worker process for parallel searches"""
+    global worker_db
+    worker_db = db
+
+
+def search_query(query, **kwargs):
+    return worker_db.search(query, taxid=query.taxid, **kwargs)
+
+
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise ArgumentTypeError(f"expected a positive integer, got '{value}'")
+    return number
+
+
 def get_parser():
     parser = ArgumentParser(description="Claspy: cell line authentication with STRs in Python")
     parser.add_argument("query", help="query STR profile")
@@ -54,7 +90,7 @@ def get_parser():
         "--db",
         metavar="PATH",
         default=CellosaurusDB.default_path(),
-        help=f"path to Cellosaurus database; default is {CellosaurusDB.default_path()}",
+        help=f"path to Cellosaurus database in JSON or binary (.pickle/.pkl) format; default is {CellosaurusDB.default_path()}",
     )
     parser.add_argument(
         "-a",
@@ -93,6 +129,14 @@ def get_parser():
         action="store_true",
         help="include the Amelogenin marker, if present, in scoring calculations; by default it is excluded",
     )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=positive_int,
+        metavar="N",
+        default=1,
+        help="search multiple query profiles in parallel using N worker processes; by default N=1 (parallel processing disabled)",
+    )
     parser.add_argument(
         "-o",
         "--out",
@@ -108,7 +152,7 @@ def db_main(arglist=None):
         records = CellosaurusDB.convert_from_download()
     else:
         records = CellosaurusDB.convert_from_path(args.path)
-    records.to_json(args.dest)
+    records.save(args.dest)
     print(f"Database written to {args.dest}", file=sys.stderr)
 
 
@@ -126,6 +170,6 @@ def get_db_parser():
         "--dest",
         metavar="PATH",
         default=CellosaurusDB.default_path(),
-        help=f"destination for the Cellosaurus database in JSON format; by default PATH={CellosaurusDB.default_path()}",
+        help=f"destination for the Cellosaurus database; the database is stored in binary format if PATH ends in .pickle or .pkl, and in JSON format otherwise; by default PATH={CellosaurusDB.default_path()}",
     )
     return parser
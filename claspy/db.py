@@ -8,18 +8,80 @@
 # Development Center.
 # -------------------------------------------------------------------------------------------------
 
-from .str_profile import Profile
+from .matrix import ProfileMatrix
 from .result import ProfileResult, SearchResult
+from .str_profile import Profile
+from collections import defaultdict
+from functools import wraps
 from importlib.resources import files
+from itertools import dropwhile, groupby
 import json
 from pathlib import Path
+import pickle
 import re
 import sys
 from tqdm import tqdm
 from urllib.request import urlretrieve
 
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+TAXID_PATTERN = re.compile(r"OX   NCBI_TaxID=(\d+); ! ([^\n]+)")
+SOURCES_PATTERN = re.compile(r"ST   Source\(s\): ([^\n]+)")
+ALLELES_PATTERN = re.compile(r"^ST   ([^:]+): ([\dXY,\. ]+)(.+)?")
+
+
+def invalidates_compiled(method):
+    """Wrap a list method so that it discards the compiled search arrays of the database"""
+
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        self._matrix = None
+        self._by_taxid = None
+        return method(self, *args, **kwargs)
+
+    return wrapper
+
 
 class CellosaurusDB(list):
+    BINARY_SUFFIXES = (".pickle", ".pkl")
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self._matrix = None
+        self._by_taxid = None
+
+    append = invalidates_compiled(list.append)
+    extend = invalidates_compiled(list.extend)
+    insert = invalidates_compiled(list.insert)
+    pop = invalidates_compiled(list.pop)
+    remove = invalidates_compiled(list.remove)
+    clear = invalidates_compiled(list.clear)
+    sort = invalidates_compiled(list.sort)
+    reverse = invalidates_compiled(list.reverse)
+    __setitem__ = invalidates_compiled(list.__setitem__)
+    __delitem__ = invalidates_compiled(list.__delitem__)
+    __iadd__ = invalidates_compiled(list.__iadd__)
+    __imul__ = invalidates_compiled(list.__imul__)
+
+    def compile(self):
+        """Encode all database profiles as arrays for vectorized scoring
+
+        Profiles are also bucketed by taxonomy ID, so that searches restricted to a particular
+        species only need to score the profiles from that species. This is invoked automatically
+        on the first search, and again after the list of profiles is modified.
+        """
+        profiles_by_taxid = defaultdict(list)
+        for profile in self:
+            for taxid in profile.taxids:
+                profiles_by_taxid[taxid].append(profile)
+        self._by_taxid = dict()
+        for taxid, profiles in profiles_by_taxid.items():
+            self._by_taxid[taxid] = ProfileMatrix(profiles)
+        self._matrix = None
+
     def search(
         self,
         query,
@@ -30,13 +92,19 @@ class CellosaurusDB(list):
         minscore=0.0,
         maxhits=20,
     ):
+        if self._by_taxid is None:
+            self.compile()
+        if taxid is None:
+            if self._matrix is None:
+                self._matrix = ProfileMatrix(self)
+            matrix = self._matrix
+        else:
+            matrix = self._by_taxid.get(int(taxid), ProfileMatrix([]))
+        scores, shared = matrix.score(query, algorithm=algorithm, mode=mode, amel=amel)
         result = SearchResult(query, minscore=minscore, maxhits=maxhits)
-        for reference in self:
-            if taxid is not None and not reference.taxid_match(taxid):
-                continue
-            score, num_shared_alleles = Profile.score(
-                query, reference, algorithm=algorithm, mode=mode, amel=amel
-            )
+        for i in matrix.select_hits(scores, shared, minscore=minscore, maxhits=maxhits):
+            reference = matrix.profiles[i]
+            score, num_shared_alleles = float(scores[i]), int(shared[i])
             proresult = ProfileResult(query._meta["sample"], score, num_shared_alleles, reference)
             result.add_profile_result(proresult)
         return result
@@ -45,16 +113,51 @@ class CellosaurusDB(list):
     def load(cls, path=None):
         if path is None:
             path = cls.default_path()
-        with open(path, "r") as instream:
+        if Path(path).suffix in cls.BINARY_SUFFIXES:
+            return cls.load_binary(path)
+        with open(path, "rb") as instream:
             return cls.from_json(instream)
 
+    def save(self, path):
+        if Path(path).suffix in self.BINARY_SUFFIXES:
+            self.save_binary(path)
+        else:
+            self.to_json(path)
+
+    @classmethod
+    def load_binary(cls, path):
+        """Load a database previously stored with `save_binary`
+
+        Pickle files can execute arbitrary code when loaded, so only load files from a trusted
+        source, such as those created by `claspy_db`.
+        """
+        with open(path, "rb") as instream:
+            records = pickle.load(instream)
+        if not isinstance(records, cls):
+            raise ValueError(f"unexpected data type '{type(records)}'")
+        return records
+
+    def save_binary(self, path):
+        """Store the database, including its compiled search arrays, in binary format
+
+        Loading a binary database skips JSON parsing, marker name validation, and array encoding,
+        making it much faster to load than the JSON format.
+        """
+        if self._by_taxid is None:
+            self.compile()
+        with open(path, "wb") as outstream:
+            pickle.dump(self, outstream, protocol=5)
+
     @staticmethod
     def default_path():
         return files("claspy") / "cellosaurus.json"
 
     @classmethod
     def from_json(cls, instream):
-        payload = json.load(instream)
+        if orjson is None:
+            payload = json.load(instream)
+        else:
+            payload = orjson.loads(instream.read())
         if not isinstance(payload, dict) and not isinstance(payload, list):
             raise ValueError(f"unexpected data type '{type(payload)}'")
         if isinstance(payload, dict):
@@ -78,7 +181,7 @@ class CellosaurusDB(list):
     @classmethod
     def convert_from_path(cls, path=None):
         profiles = cls()
-        with open(path, "r") as instream:
+        with open(path, "rb", buffering=1 << 20) as instream:
             parser = cls.parse_cellosaurus_records(instream)
             for n, profile in enumerate(parser):
                 profiles.append(profile)
@@ -96,24 +199,29 @@ class CellosaurusDB(list):
 
     @staticmethod
     def parse_cellosaurus_into_blocks(instream):
-        block = list()
-        for line in instream:
-            if line.startswith("ID"):
-                break
-        block.append(line.strip())
-        for line in instream:
-            line = line.strip()
-            if line == "//":
-                yield block
-                block = list()
-            block.append(line)
+        """Split the Cellosaurus flat file into records
+
+        The file can be opened in text or binary mode; in binary mode, each line is decoded as it is
+        read.
+        """
+        lines = (line.decode("utf-8") if isinstance(line, bytes) else line for line in instream)
+        lines = dropwhile(lambda line: not line.startswith("ID"), lines)
+        lines = (line.strip() for line in lines)
+        for is_terminator, block in groupby(lines, key=lambda line: line == "//"):
+            if not is_terminator:
+                yield list(block)
 
     def to_json(self, output):
+        payload = [profile.payload for profile in self]
+        if orjson is None:
+            data = json.dumps(payload, indent=2, ensure_ascii=False)
+        else:
+            data = orjson.dumps(payload, option=orjson.OPT_INDENT_2).decode()
         if isinstance(output, str) or isinstance(output, Path):
-            with open(output, "w") as outstream:
-                json.dump([profile.payload for profile in self], outstream, indent=4)
+            with open(output, "w", encoding="utf-8") as outstream:
+                outstream.write(data)
         else:
-            json.dump([profile.payload for profile in self], output, indent=4)
+            output.write(data)
 
 
 class CellosaurusEntry:
@@ -128,55 +236,67 @@ class CellosaurusEntry:
         self.meta = dict()
         self.alleles = dict()
         for line in data:
-            self.parse_meta(line)
-            self.parse_sources(line)
-            self.parse_alleles(line)
+            handler = self.HANDLERS.get(line[:2])
+            if handler:
+                handler(self, line)
 
     def parse_meta(self, line):
-        if line.startswith(("ID", "AC", "SY")):
-            key, value = re.split(r"\s+", line, 1)
-            assert key not in self.meta, key
-            self.meta[self.ATTRIBUTES[key]] = value
-        elif line.startswith("OX"):
-            match = re.match(r"OX   NCBI_TaxID=(\d+); ! ([^\n]+)", line)
-            if not match:
-                raise ValueError(f"cannot parse species of origin: {line}")
-            taxid, organism = match.groups()
-            if "taxid" not in self.meta:
-                self.meta["taxid"] = list()
-                self.meta["organism"] = list()
-            self.meta["taxid"].append(int(taxid))
-            self.meta["organism"].append(organism)
+        key, value = line.split(None, 1)
+        assert key not in self.meta, key
+        self.meta[self.ATTRIBUTES[key]] = value
+
+    def parse_taxid(self, line):
+        match = TAXID_PATTERN.match(line)
+        if not match:
+            raise ValueError(f"cannot parse species of origin: {line}")
+        taxid, organism = match.groups()
+        if "taxid" not in self.meta:
+            self.meta["taxid"] = list()
+            self.meta["organism"] = list()
+        self.meta["taxid"].append(int(taxid))
+        self.meta["organism"].append(organism)
+
+    def parse_str(self, line):
+        if "Source" in line:
+            self.parse_sources(line)
+        elif "Not_detected" not in line:
+            self.parse_alleles(line)
 
     def parse_sources(self, line):
-        if line.startswith("ST") and "Source" in line:
-            match = re.match(r"ST   Source\(s\): ([^\n]+)", line)
-            if not match:
-                raise ValueError(f"could not parse sources: {line}")
-            source_string = match.group(1)
-            for source in source_string.split("; "):
-                self.alleles[source] = dict()
+        match = SOURCES_PATTERN.match(line)
+        if not match:
+            raise ValueError(f"could not parse sources: {line}")
+        source_string = match.group(1)
+        for source in source_string.split("; "):
+            self.alleles[source] = dict()
 
     def parse_alleles(self, line):
-        if line.startswith("ST") and "Source" not in line and "Not_detected" not in line:
-            match = re.match(r"^ST   ([^:]+): ([\dXY,\. ]+)(.+)?", line)
-            if not match:
-                raise ValueError(f"could not parse STR profile data: {line}")
-            marker, allele_str, sources = match.groups()
-            if sources is None:
-                for marker_alleles in self.alleles.values():
-                    marker_alleles[marker] = allele_str.strip()
-            else:
-                sources = sources.replace("(", "").replace(")", "")
-                for source in sources.split("; "):
-                    if source not in self.alleles:
-                        print(
-                            "[CellosaurusDB] WARNING:",
-                            f"Source '{source}' not defined for cell line {self.meta['identifier']}",
-                            file=sys.stderr,
-                        )
-                    else:
-                        self.alleles[source][marker] = allele_str.strip()
+        match = ALLELES_PATTERN.match(line)
+        if not match:
+            raise ValueError(f"could not parse STR profile data: {line}")
+        marker, allele_str, sources = match.groups()
+        if sources is None:
+            for marker_alleles in self.alleles.values():
+                marker_alleles[marker] = allele_str.strip()
+        else:
+            sources = sources.replace("(", "").replace(")", "")
+            for source in sources.split("; "):
+                if source not in self.alleles:
+                    print(
+                        "[CellosaurusDB] WARNING:",
+                        f"Source '{source}' not defined for cell line {self.meta['identifier']}",
+                        file=sys.stderr,
+                    )
+                else:
+                    self.alleles[source][marker] = allele_str.strip()
+
+    HANDLERS = {
+        "ID": parse_meta,
+        "AC": parse_meta,
+        "SY": parse_meta,
+        "OX": parse_taxid,
+        "ST": parse_str,
+    }
 
     @property
     def profiles(self):
@@ -8,6 +8,7 @@
 # Development Center.
 # -------------------------------------------------------------------------------------------------
 
+from functools import lru_cache
 
 valid_names = {
     9606: [
@@ -47,7 +48,6 @@ valid_names = {
         "DYS389II",
         "DYS390",
         "DYS391",
-        "DYS391",
         "DYS392",
         "DYS437",
         "DYS438",
@@ -60,8 +60,6 @@ valid_names = {
         "DYS533",
         "DYS549",
         "DYS570",
-        "DYS570",
-        "DYS576",
         "DYS576",
         "DYS612",
         "DYS635",
@@ -123,6 +121,23 @@ species_by_taxid = {
 }
 
 
+def _index_names():
+    index = dict()
+    for taxid, species_names in valid_names.items():
+        for species_name in species_names:
+            candidate = species_name.replace(" ", "").lower()
+            index.setdefault(candidate, (species_name, taxid))
+    return index
+
+
+_standard_names = _index_names()
+
+# Each marker is assigned a small integer ID, used to index markers in array representations of
+# STR profiles.
+all_marker_names = list(dict.fromkeys(name for names in valid_names.values() for name in names))
+marker_ids = {name: i for i, name in enumerate(all_marker_names)}
+
+
 def validate_names(marker_names):
     """Validate marker names
 
@@ -148,11 +163,7 @@ def validate_names(marker_names):
     return valid, taxid
 
 
+@lru_cache(maxsize=4096)
 def standardize_name(name):
     candidate = name.replace(" ", "").lower()
-    for taxid, species_names in valid_names.items():
-        for species_name in species_names:
-            species_candidate = species_name.replace(" ", "").lower()
-            if candidate == species_candidate:
-                return species_name, taxid
-    return None, None
+    return _standard_names.get(candidate, (None, None))
@@ -0,0 +1,130 @@
+# -------------------------------------------------------------------------------------------------
+# Copyright (c) 2023, DHS.
+# This file is part of claspy: https://github.com/bioforensics/claspy
+#
+# This software was prepared for the Department of Homeland Security (DHS) by the Battelle National
+# Biodefense Institute, LLC (BNBI) as part of contract HSHQDC-15-C-00064 to manage and operate the
+# National Biodefense Analysis and Countermeasures Center (NBACC), a Federally Funded Research and
+# Development Center.
+# -------------------------------------------------------------------------------------------------
+
+from .markers import all_marker_names, marker_ids
+import numpy as np
+
+
+class ProfileMatrix:
+    """Struct-of-arrays representation of a list of STR profiles
+
+    Each allele observed in the profiles is assigned a small integer code, and the alleles of all
+    profiles are stored in a single 3D array indexed by profile, marker, and allele slot (padded
+    with -1). This allows a query profile to be scored against every profile at once with
+    vectorized array operations, rather than with one call to `Profile.score` per profile.
+    """
+
+    CACHE_SIZE = 128
+
+    def __init__(self, profiles):
+        self.profiles = list(profiles)
+        maxalleles = max(
+            (len(a) for profile in self.profiles for a in profile._alleles.values()), default=1
+        )
+        self.allele_codes = dict()
+        self.alleles = np.full(
+            (len(self.profiles), len(all_marker_names), maxalleles), -1, dtype=np.int16
+        )
+        cell_line_codes = dict()
+        self.cell_lines = np.zeros(len(self.profiles), dtype=np.int32)
+        for i, profile in enumerate(self.profiles):
+            for marker, marker_alleles in profile._alleles.items():
+                j = marker_ids[marker]
+                for k, allele in enumerate(marker_alleles):
+                    code = self.allele_codes.setdefault(allele, len(self.allele_codes))
+                    self.alleles[i, j, k] = code
+            identifier = profile._meta.get("identifier", i)
+            code = cell_line_codes.setdefault(identifier, len(cell_line_codes))
+            self.cell_lines[i] = code
+        self.counts = (self.alleles >= 0).sum(axis=2, dtype=np.int32)
+        self.present = self.counts > 0
+        self.scoring_markers = np.ones(len(all_marker_names), dtype=bool)
+        self.scoring_markers[marker_ids["Amelogenin"]] = False
+        self._cache = dict()
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state["_cache"] = dict()
+        return state
+
+    def score(self, query, algorithm="Tanabe", mode="intersect", amel=False, cache=True):
+        """Compute similarity scores between a query and all profiles
+
+        See `Profile.score` for a description of the scoring algorithms and modes. Returns an
+        array of scores and an array of shared allele counts, each with one value per profile.
+
+        By default scores are cached by the query's alleles, so that identical query profiles (such
+        as replicates of the same sample) are only scored once. The returned arrays are read-only.
+        Set `cache=False` for a matrix that will only be used once.
+        """
+        if algorithm not in ("Tanabe", "query", "reference"):
+            raise ValueError(f"unsupported scoring algorithm '{algorithm}'")
+        if mode not in ("intersect", "query", "reference"):
+            raise ValueError(f"unsupported scoring mode '{mode}'")
+        key = (query.fingerprint, algorithm, mode, amel)
+        if not cache:
+            return self._compute_scores(*key)
+        if key not in self._cache:
+            if len(self._cache) >= self.CACHE_SIZE:
+                del self._cache[next(iter(self._cache))]
+            self._cache[key] = self._compute_scores(*key)
+        return self._cache[key]
+
+    def _compute_scores(self, fingerprint, algorithm, mode, amel):
+        pairs = [(m, a) for m, a in fingerprint if amel or self.scoring_markers[marker_ids[m]]]
+        columns = sorted({marker_ids[marker] for marker, allele in pairs})
+        position = {j: i for i, j in enumerate(columns)}
+        query_counts = np.zeros(len(columns), dtype=np.int32)
+        shared = np.zeros(len(self.profiles), dtype=np.int32)
+        for marker, allele in pairs:
+            j = marker_ids[marker]
+            query_counts[position[j]] += 1
+            if allele in self.allele_codes:
+                shared += (self.alleles[:, j, :] == self.allele_codes[allele]).any(axis=1)
+        if mode == "query":
+            query_alleles = np.full(len(self.profiles), query_counts.sum(), dtype=np.int32)
+        else:
+            query_alleles = self.present[:, columns] @ query_counts
+        if mode == "reference":
+            counts = self.counts if amel else self.counts[:, self.scoring_markers]
+            refr_alleles = counts.sum(axis=1)
+        else:
+            refr_alleles = self.counts[:, columns].sum(axis=1)
+        if algorithm == "Tanabe":
+            numerator, denominator = 2 * shared, query_alleles + refr_alleles
+        elif algorithm == "query":
+            numerator, denominator = shared, query_alleles
+        else:
+            numerator, denominator = shared, refr_alleles
+        scores = np.zeros(len(self.profiles), dtype=np.float64)
+        np.divide(numerator, denominator, out=scores, where=shared > 0)
+        scores.flags.writeable = False
+        shared.flags.writeable = False
+        return scores, shared
+
+    def select_hits(self, scores, shared, minscore=0.0, maxhits=20):
+        """Select the profiles to be included in a search result
+
+        Cell lines are ranked by their top score (ties broken by number of shared alleles and then
+        by order of appearance), and the indices of all profiles belonging to the (at most)
+        `maxhits` top cell lines with a top score >= `minscore` are returned in their original
+        order.
+        """
+        order = np.lexsort((shared, scores, self.cell_lines))
+        last = np.ones(len(order), dtype=bool)
+        last[:-1] = self.cell_lines[order][1:] != self.cell_lines[order][:-1]
+        best = order[last]
+        best = best[scores[best] >= minscore]
+        first = np.full(self.cell_lines.max(initial=0) + 1, len(self.profiles))
+        np.minimum.at(first, self.cell_lines, np.arange(len(self.profiles)))
+        ranked = best[np.lexsort((first[self.cell_lines[best]], -shared[best], -scores[best]))]
+        if maxhits > 0:
+            ranked = ranked[:maxhits]
+        return np.flatnonzero(np.isin(self.cell_lines, self.cell_lines[ranked]))
@@ -9,17 +9,23 @@
 # -------------------------------------------------------------------------------------------------
 
 from collections import defaultdict, namedtuple
+from functools import cached_property, wraps
+import heapq
 import pandas as pd
 
 
 class SearchResult:
     """Result for database search of a single query profile
 
-    The SearchResult includes a score for every profile of the relevant species in the database.
-    Distinct profiles for the same cell line are stored in a single CellLineResult object,
-    accessible by that cell line's identifier.
+    The SearchResult includes only the reported hits: a score for every profile of the (at most
+    `maxhits`) top-scoring cell lines with a score of at least `minscore`. Distinct profiles for
+    the same cell line are stored in a single CellLineResult object, accessible by that cell line's
+    identifier.
     """
 
+    SUMMARY_COLUMNS = ["Sample", "CellLine", "Score", "SharedAlleles", "Source"]
+    REPORT_COLUMNS = ["Sample", "CellLine", "Status", "Score", "SharedAlleles", "Source"]
+
     def __init__(self, query, minscore=0.0, maxhits=20):
         self.query = query
         self.minscore = minscore
@@ -28,32 +34,47 @@ class SearchResult:
 
     def add_profile_result(self, result):
         self.results_by_cell_line[result.reference.identifier].append(result)
+        self.__dict__.pop("top_results", None)
+        self.__dict__.pop("all_markers", None)
+
+    def summary_rows(self):
+        for result in self.top_results:
+            yield result.summary
 
     @property
     def summary(self):
-        colnames = ["Sample", "CellLine", "Score", "SharedAlleles", "Source"]
-        summary = pd.DataFrame([result.summary for result in self], columns=colnames)
-        return summary
+        return pd.DataFrame(list(self.summary_rows()), columns=self.SUMMARY_COLUMNS)
+
+    def full_report_rows(self, markers):
+        """Generate one row per profile to be included in the full report
+
+        The first row contains the query profile, followed by the best (and, where applicable,
+        worst) scoring profile of each cell line reported. Allele data is reported for the given
+        markers, in order.
+        """
+        markers = tuple(markers)
+        sample = self.query._meta["sample"]
+        yield (sample, sample, "query", None, None, None, *self.query.marker_alleles(markers))
+        for result in self.top_results:
+            yield from result.full_report(markers)
 
     @property
     def full_report(self):
-        entries = list()
         markers = self.all_markers
-        entry = (
-            self.query._meta["sample"],
-            self.query._meta["sample"],
-            "query",
-            pd.NA,
-            pd.NA,
-            pd.NA,
-            *self.query.marker_alleles(markers),
-        )
-        entries.append(entry)
-        for result in self:
-            for entry in result.full_report(markers):
-                entries.append(entry)
-        colnames = ["Sample", "CellLine", "Status", "Score", "SharedAlleles", "Source"] + markers
-        return pd.DataFrame(entries, columns=colnames)
+        return self.report_table(self.full_report_rows(markers), markers)
+
+    @classmethod
+    def report_table(cls, rows, markers):
+        """Construct a full report table from report rows
+
+        Score, SharedAlleles, and Source are cast to typed columns, rather than leaving them as
+        generic Python objects due to the missing values in query rows.
+        """
+        table = pd.DataFrame(list(rows), columns=cls.REPORT_COLUMNS + markers)
+        table["Score"] = table["Score"].astype("float64")
+        table["SharedAlleles"] = table["SharedAlleles"].astype("Int64")
+        table["Source"] = table["Source"].astype("string")
+        return table
 
     def __iter__(self):
         for n, identifier in enumerate(self.ids_by_score):
@@ -66,57 +87,113 @@ class SearchResult:
 
     @property
     def ids_by_score(self):
-        sorted_results = sorted(
-            self.results_by_cell_line.values(),
-            key=lambda result: (result.top_score, result.top_score_shared_alleles),
-            reverse=True,
-        )
-        for result in sorted_results:
+        """Identifiers of cell lines in order of decreasing score
+
+        If `maxhits` is set, only the top-scoring cell lines are selected (without sorting the
+        entire result set).
+        """
+        results = self.results_by_cell_line.values()
+        if self.maxhits > 0:
+            results = heapq.nlargest(self.maxhits, results, key=CellLineResult.rank)
+        else:
+            results = sorted(results, key=CellLineResult.rank, reverse=True)
+        for result in results:
             yield result.identifier
 
-    @property
+    @cached_property
+    def top_results(self):
+        """The cell line results to be reported, in rank order"""
+        return list(self)
+
+    @cached_property
     def all_markers(self):
         """Determine all markers to report
 
         This includes any marker for which allele data is present in the query or at least one of
         the database profiles to be included in the final full report.
         """
-        markers = set()
-        for marker, allele in self.query.alleles():
-            markers.add(marker)
-        for result in self:
-            for subresult in result:
-                for marker, allele in subresult.reference.alleles():
-                    markers.add(marker)
+        references = (subresult.reference for result in self.top_results for subresult in result)
+        markers = set(self.query.markers).union(*(ref.markers for ref in references))
         return sorted(markers)
 
 
+def recomputes_top_score(method):
+    """Wrap a list method so that it recomputes the top score of a cell line result"""
+
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        value = method(self, *args, **kwargs)
+        self._update_top_score()
+        return value
+
+    return wrapper
+
+
 class CellLineResult(list):
     """A list of query search scores and database profiles from the same cell line
 
     This class is a list of ProfileResult objects, and essentially provides some convenience
     functions for handling one or more scored profiles for a cell line from a database search.
+    The top score is tracked incrementally as results are appended, and recomputed when the list is
+    modified in any other way.
     """
 
+    def __init__(self, results=()):
+        super().__init__()
+        self._top_score = None
+        self._top_score_shared_alleles = None
+        self._identifier = None
+        for result in results:
+            self.append(result)
+
+    def append(self, result):
+        """Add a profile result, keeping track of the top score as results are added"""
+        super().append(result)
+        self._track_top_score(result)
+
+    extend = recomputes_top_score(list.extend)
+    insert = recomputes_top_score(list.insert)
+    pop = recomputes_top_score(list.pop)
+    remove = recomputes_top_score(list.remove)
+    clear = recomputes_top_score(list.clear)
+    __setitem__ = recomputes_top_score(list.__setitem__)
+    __delitem__ = recomputes_top_score(list.__delitem__)
+    __iadd__ = recomputes_top_score(list.__iadd__)
+    __imul__ = recomputes_top_score(list.__imul__)
+
+    def _update_top_score(self):
+        self._top_score = None
+        self._top_score_shared_alleles = None
+        self._identifier = None
+        for result in self:
+            self._track_top_score(result)
+
+    def _track_top_score(self, result):
+        if self._top_score is None or result.score > self._top_score:
+            self._top_score = result.score
+            self._top_score_shared_alleles = result.shared_alleles
+        elif result.score == self._top_score:
+            if result.shared_alleles > self._top_score_shared_alleles:
+                self._top_score_shared_alleles = result.shared_alleles
+
     @property
     def top_score(self):
-        return max([single_result.score for single_result in self])
+        return self._top_score
 
     @property
     def top_score_shared_alleles(self):
-        return max(
-            [
-                single_result.shared_alleles
-                for single_result in self
-                if single_result.score == self.top_score
-            ]
-        )
+        return self._top_score_shared_alleles
+
+    def rank(self):
+        return self.top_score, self.top_score_shared_alleles
 
     @property
     def identifier(self):
-        ids = [single_result.reference.identifier for single_result in self]
-        assert len(set(ids)) == 1
-        return ids[0]
+        if self._identifier is None:
+            ids = [single_result.reference.identifier for single_result in self]
+            assert len(set(ids)) == 1
+            self._identifier = ids[0]
+        return self._identifier
 
     @property
     def sample(self):
@@ -126,24 +203,24 @@ class CellLineResult(list):
 
     @property
     def summary(self):
-        results = sorted(self, reverse=True)
-        best = results[0]
-        best = (best.score, best.shared_alleles, best.reference.source)
-        return self.sample, self.identifier, *best
+        best = max(self, key=ProfileResult.rank)
+        return self.sample, self.identifier, *best.summary
 
     def full_report(self, markers):
-        results = sorted(self, reverse=True)
-        best = results[0]
-        status = "best" if len(results) > 1 else "only"
+        best = max(self, key=ProfileResult.rank)
+        status = "best" if len(self) > 1 else "only"
         yield self.sample, self.identifier, status, *best.full_report(markers)
-        if len(results) > 1:
-            worst = results[-1]
+        if len(self) > 1:
+            worst = min(self, key=ProfileResult.rank)
             yield self.sample, self.identifier, "worst", *worst.full_report(markers)
 
 
 class ProfileResult(namedtuple("ProfileResult", "sample score shared_alleles reference")):
     """Score from comparing a query profile to a single database reference profile"""
 
+    def rank(self):
+        return self.score, self.shared_alleles, self.reference
+
     @property
     def summary(self):
         return self.score, self.shared_alleles, self.reference.source
@@ -9,8 +9,15 @@
 # -------------------------------------------------------------------------------------------------
 
 from .markers import validate_names
+from .matrix import ProfileMatrix
+import csv
+from functools import cached_property
+from io import StringIO
+import numpy as np
 import pandas as pd
-import re
+import sys
+
+WHITESPACE = str.maketrans("", "", " \t")
 
 
 class Profile:
@@ -27,30 +34,65 @@ class Profile:
         self.taxid = taxid
         self._alleles = dict()
         for marker, marker_alleles in alleles.items():
-            marker = valid_names[marker]
+            marker = sys.intern(valid_names[marker])
             marker_alleles = Profile.parse_allele_string(marker_alleles)
-            self._alleles[marker] = marker_alleles
+            self._alleles[marker] = frozenset(sys.intern(a) for a in marker_alleles)
+        self._repr_cache = dict()
+        self._markers_noamel = self.markers - {"Amelogenin"}
+        self._len = sum(len(a) for a in self._alleles.values())
+        self._taxids = frozenset(self.taxids)
 
     @classmethod
     def load(cls, path):
         types = {f"Allele{i+1}": str for i in range(10)}
-        data = pd.read_csv(path, sep=None, engine="python", dtype=types)
+        delimiter = Profile.sniff_delimiter(path)
+        if delimiter is None:
+            data = pd.read_csv(path, sep=None, engine="python", dtype=types)
+        else:
+            data = pd.read_csv(path, sep=delimiter, engine="c", dtype=types)
         for column in ("Sample", "Marker", "Allele1"):
             if column not in data.columns:
                 raise ValueError(f"expected column '{column}' missing")
-        for sample_name, sample_data in data.groupby("Sample"):
-            numalleles = Profile.num_alleles_from_table(sample_data)
-            metadata = {"sample": sample_data.Sample.iloc[0]}
-            alleles = dict()
-            for i, row in sample_data.iterrows():
-                marker_alleles = list()
-                for n in range(numalleles):
-                    allele = row[f"Allele{n+1}"]
-                    if not pd.isna(allele):
-                        marker_alleles.append(allele)
-                alleles[row.Marker] = ",".join(sorted(marker_alleles))
+        numalleles = Profile.num_alleles_from_table(data)
+        table = data[[f"Allele{n+1}" for n in range(numalleles)]]
+        observed = table.notna().to_numpy().tolist()
+        table = table.to_numpy().tolist()
+        samples = data.Sample.to_numpy()
+        markers = data.Marker.to_numpy()
+        for sample_name, rows in data.groupby("Sample").indices.items():
+            metadata = {"sample": samples[rows[0]]}
+            allele_strings = list()
+            for i in rows.tolist():
+                row_alleles = [a for a, present in zip(table[i], observed[i]) if present]
+                allele_strings.append(",".join(sorted(row_alleles)))
+            alleles = dict(zip(markers[rows], allele_strings))
             yield Profile(alleles, metadata)
 
+    @staticmethod
+    def sniff_delimiter(path):
+        """Determine the delimiter of a tabular file from its header line
+
+        This allows the file to be parsed by the fast C engine in pandas, which (unlike the Python
+        engine) cannot detect the delimiter itself. Returns None if the header cannot be read as
+        plain text, such as for compressed files or URLs, leaving detection to the Python engine.
+        """
+        try:
+            if hasattr(path, "read"):
+                position = path.tell()
+                header = path.readline()
+                path.seek(position)
+            else:
+                with open(path, "rb") as instream:
+                    header = instream.readline(65536)
+            if isinstance(header, bytes):
+                header = header.decode("utf-8")
+        except (OSError, UnicodeDecodeError):
+            return None
+        try:
+            return csv.Sniffer().sniff(header, delimiters=",\t;|").delimiter
+        except csv.Error:
+            return ","
+
     @staticmethod
     def num_alleles_from_table(table):
         count = 1
@@ -68,7 +110,7 @@ class Profile:
 
     @staticmethod
     def parse_allele_string(alleles):
-        return set(alleles.replace(" ", "").split(","))
+        return set(alleles.translate(WHITESPACE).split(","))
 
     @staticmethod
     def allele_repr(allele_set):
@@ -81,7 +123,7 @@ class Profile:
     def allele_transform(allele):
         if "." in allele:
             return float(allele)
-        elif re.match(r"^\d+$", allele):
+        elif allele.isdecimal():
             return int(allele)
         elif allele in ("X", "Y"):
             return allele
@@ -91,27 +133,29 @@ class Profile:
     @property
     def table(self):
         sample = self._meta["sample"] if "sample" in self._meta else "sample"
-        alleles = list()
-        for marker, marker_alleles in self._alleles.items():
-            allele_repr = Profile.allele_repr(marker_alleles)
-            sorted_alleles = allele_repr.split(",")
-            entry = [sample, marker, *sorted_alleles]
-            while len(entry) < self.max_num_alleles + 2:
-                entry.append(None)
-            alleles.append(entry)
-        colnames = ["Sample", "Marker"] + [f"Allele{i+1}" for i in range(self.max_num_alleles)]
+        numalleles = self.max_num_alleles
+        alleles = np.full((len(self._alleles), numalleles + 2), None, dtype=object)
+        for i, marker in enumerate(self._alleles):
+            sorted_alleles = self.marker_repr(marker).split(",")
+            alleles[i, 0] = sample
+            alleles[i, 1] = marker
+            alleles[i, 2 : 2 + len(sorted_alleles)] = sorted_alleles
+        colnames = ["Sample", "Marker"] + [f"Allele{i+1}" for i in range(numalleles)]
         return pd.DataFrame(alleles, columns=colnames)
 
-    @property
+    @cached_property
     def max_num_alleles(self):
-        return max([len(allele_set) for allele_set in self._alleles.values()])
+        return max((len(allele_set) for allele_set in self._alleles.values()), default=0)
 
     def marker_alleles(self, markers):
-        for marker in markers:
-            if marker not in self._alleles:
-                yield pd.NA
-            else:
-                yield Profile.allele_repr(self._alleles[marker])
+        """Allele representation for each of the given markers, None for missing markers"""
+        return tuple(self.marker_repr(m) if m in self._alleles else None for m in markers)
+
+    def marker_repr(self, marker):
+        """Allele representation for the given marker, computed once and cached"""
+        if marker not in self._repr_cache:
+            self._repr_cache[marker] = Profile.allele_repr(self._alleles[marker])
+        return self._repr_cache[marker]
 
     def __iter__(self):
         for marker, alleles in self._alleles.items():
@@ -119,7 +163,7 @@ class Profile:
                 yield marker, allele
 
     def __len__(self):
-        return len([allele for allele in self])
+        return self._len
 
     @staticmethod
     def score(query, reference, algorithm="Tanabe", mode="intersect", amel=False):
@@ -153,51 +197,94 @@ class Profile:
         if mode not in ("intersect", "query", "reference"):
             raise ValueError(f"unsupported scoring mode '{mode}'")
         markers = Profile.markers_for_scoring(query, reference, mode=mode, amel=amel)
-        query_alleles = len(query.alleles(markers=markers))
-        refr_alleles = len(reference.alleles(markers=markers))
-        shared_alleles = len(query.alleles(markers=markers) & reference.alleles(markers=markers))
-        score = 0.0
-        if shared_alleles > 0:
-            if algorithm == "Tanabe":
-                score = (2 * shared_alleles) / (query_alleles + refr_alleles)
-            elif algorithm == "query":
-                score = shared_alleles / query_alleles
-            else:
-                score = shared_alleles / refr_alleles
+        if not markers:
+            return 0.0, 0
+        query_alleles = query.alleles(markers=markers)
+        refr_alleles = reference.alleles(markers=markers)
+        if query_alleles.isdisjoint(refr_alleles):
+            return 0.0, 0
+        shared_alleles = len(query_alleles & refr_alleles)
+        if algorithm == "Tanabe":
+            score = (2 * shared_alleles) / (len(query_alleles) + len(refr_alleles))
+        elif algorithm == "query":
+            score = shared_alleles / len(query_alleles)
+        else:
+            score = shared_alleles / len(refr_alleles)
         return score, shared_alleles
 
+    @staticmethod
+    def score_many(query, references, algorithm="Tanabe", mode="intersect", amel=False):
+        """Compute similarity scores between a query and each of a list of reference profiles
+
+        Equivalent to calling `Profile.score` for each reference. Returns an array of scores and an
+        array of shared allele counts, each with one value per reference profile.
+
+        The references can be given as a list of profiles or as a `ProfileMatrix`. Scoring against
+        a matrix is vectorized and much faster than calling `Profile.score` repeatedly, but
+        building the matrix is not: it only pays off when the same matrix is used to score several
+        queries. To do so, build it once with `ProfileMatrix(references)` and pass it here.
+        """
+        if isinstance(references, ProfileMatrix):
+            return references.score(query, algorithm=algorithm, mode=mode, amel=amel)
+        matrix = ProfileMatrix(references)
+        return matrix.score(query, algorithm=algorithm, mode=mode, amel=amel, cache=False)
+
     @staticmethod
     def markers_for_scoring(query, reference, mode="intersect", amel=False):
+        query_markers = query.markers if amel else query._markers_noamel
+        refr_markers = reference.markers if amel else reference._markers_noamel
         if mode == "intersect":
-            markers = query.markers & reference.markers
+            return query_markers & refr_markers
         elif mode == "query":
-            markers = query.markers
+            return query_markers
         else:
-            markers = reference.markers
-        if not amel:
-            markers = [m for m in markers if m != "Amelogenin"]
-        return markers
+            return refr_markers
 
-    @property
+    @cached_property
     def markers(self):
-        return set(self._alleles.keys())
+        return frozenset(self._alleles)
+
+    @cached_property
+    def _pairs_by_marker(self):
+        return {
+            marker: frozenset((marker, allele) for allele in alleles)
+            for marker, alleles in self._alleles.items()
+        }
+
+    @cached_property
+    def fingerprint(self):
+        """Set of all (marker, allele) pairs in the profile, computed on first use"""
+        return frozenset().union(*self._pairs_by_marker.values())
 
     def alleles(self, markers=None):
+        """Set of (marker, allele) pairs, optionally restricted to the specified markers"""
         if markers is None:
-            markers = self.markers
-        return {(marker, allele) for marker, allele in self if marker in markers}
+            return self.fingerprint
+        pairs = self._pairs_by_marker
+        return frozenset().union(*(pairs[marker] for marker in markers if marker in pairs))
 
     def __str__(self):
-        return self.table.to_csv(index=False)
+        sample = self._meta["sample"] if "sample" in self._meta else "sample"
+        numalleles = self.max_num_alleles
+        output = StringIO()
+        writer = csv.writer(output, lineterminator="\n")
+        writer.writerow(["Sample", "Marker"] + [f"Allele{i+1}" for i in range(numalleles)])
+        for marker in self._alleles:
+            sorted_alleles = self.marker_repr(marker).split(",")
+            padding = [""] * (numalleles - len(sorted_alleles))
+            writer.writerow([sample, marker, *sorted_alleles, *padding])
+        return output.getvalue()
+
+    @property
+    def taxids(self):
+        """Taxonomy IDs of the species of origin, as recorded in the profile metadata"""
+        taxids = self._meta.get("taxid", list())
+        if not isinstance(taxids, list):
+            taxids = [taxids]
+        return [int(taxid) for taxid in taxids]
 
     def taxid_match(self, taxid):
-        if isinstance(self._meta["taxid"], list):
-            for testid in self._meta["taxid"]:
-                if int(testid) == int(taxid):
-                    return True
-            return False
-        else:
-            return int(self._meta["taxid"]) == int(taxid)
+        return int(taxid) in self._taxids
 
     @property
     def identifier(self):
@@ -207,11 +294,11 @@ class Profile:
     def source(self):
         return self._meta["source"]
 
-    @property
+    @cached_property
     def payload(self):
         return {"meta": self._meta, "alleles": self.allele_dict}
 
-    @property
+    @cached_property
     def allele_dict(self):
         return {marker: ",".join(sorted(alleles)) for marker, alleles in self._alleles.items()}
 
@@ -221,7 +308,3 @@ class Profile:
 
     def __lt__(self, other):
         return self.slug < other.slug
-
-    @property
-    def payload(self):
-        return {"meta": self._meta, "alleles": self.allele_dict}
@@ -9,7 +9,10 @@
 # -------------------------------------------------------------------------------------------------
 
 import claspy
+from claspy.db import CellosaurusDB
+from claspy.result import SearchResult
 from claspy.tests import data_file
+import pandas as pd
 import pytest
 
 
@@ -22,3 +25,45 @@ def test_search_report_sorting(tmp_path):
         observed = fh1.read().strip()
         expected = fh2.read().strip()
         assert observed == expected
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_search_multiple_queries(jobs, tmp_path):
+    report = tmp_path / "report.csv"
+    arglist = [
+        data_file("mock-sk-hep-1-2samples.csv"),
+        "--db",
+        data_file("skhep1-db.json"),
+        "--max-hits",
+        3,
+        "--jobs",
+        jobs,
+        "--out",
+        report,
+    ]
+    claspy.cli.main(arglist=arglist)
+    observed = pd.read_csv(report)
+    assert len(observed) == 10
+    assert observed.Sample.to_list() == ["mock_1"] * 5 + ["mock_2"] * 5
+    assert observed.Status.to_list() == ["query", "best", "worst", "only", "only"] * 2
+    assert list(observed.columns[:6]) == SearchResult.REPORT_COLUMNS
+
+
+def test_parallel_search_binary_db(monkeypatch, tmp_path):
+    dbpath = tmp_path / "db.pickle"
+    CellosaurusDB.load(data_file("skhep1-db.json")).save(dbpath)
+
+    def no_compile(self):
+        raise AssertionError("binary database should not be recompiled")
+
+    monkeypatch.setattr(CellosaurusDB, "compile", no_compile)
+    arglist = [data_file("mock-sk-hep-1-2samples.csv"), "--db", dbpath, "--jobs", 2]
+    claspy.cli.main(arglist=arglist)
+
+
+@pytest.mark.parametrize("jobs", [0, -2, "many"])
+def test_invalid_jobs(jobs, capsys):
+    arglist = [data_file("mock-sk-hep-1.csv"), "--db", data_file("skhep1-db.json"), "-j", jobs]
+    with pytest.raises(SystemExit):
+        claspy.cli.main(arglist=arglist)
+    assert "argument -j/--jobs" in capsys.readouterr().err
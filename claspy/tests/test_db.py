@@ -7,10 +7,12 @@
 # National Biodefense Analysis and Countermeasures Center (NBACC), a Federally Funded Research and
 # Development Center.
 # -------------------------------------------------------------------------------------------------
+import claspy
 from claspy.db import CellosaurusDB
 from claspy import Profile
 from claspy.tests import data_file
 from io import StringIO
+import pandas as pd
 import pytest
 
 
@@ -35,3 +37,84 @@ def test_db_round_trip(tmp_path):
     db1.to_json(json1)
     db2.to_json(json2)
     assert json1.getvalue() == json2.getvalue()
+
+
+def test_search_by_taxid():
+    db = CellosaurusDB.load(data_file("skhep1-db.json"))
+    query = next(Profile.load(data_file("mock-sk-hep-1.csv")))
+    assert len(db.search(query, taxid=9606, maxhits=0).summary) == 11
+    assert len(db.search(query, taxid=None, maxhits=0).summary) == 11
+    assert len(db.search(query, taxid=10090, maxhits=0).summary) == 0
+
+
+def test_search_after_modification():
+    db = CellosaurusDB.load(data_file("skhep1-db.json"))
+    query = next(Profile.load(data_file("mock-sk-hep-1.csv")))
+    half = CellosaurusDB(db[:3])
+    assert len(half.search(query, maxhits=0).summary) == 1
+    half.extend(db[3:])
+    assert len(half.search(query, maxhits=0).summary) == 11
+    del half[3:]
+    assert len(half.search(query, maxhits=0).summary) == 1
+    half += db[3:]
+    assert len(half.search(query, taxid=None, maxhits=0).summary) == 11
+    half[0] = db[-1]
+    fresh = CellosaurusDB(half)
+    assert half.search(query, maxhits=0).summary.equals(fresh.search(query, maxhits=0).summary)
+    half.clear()
+    assert len(half.search(query, maxhits=0).summary) == 0
+
+
+def test_convert_from_path():
+    db = CellosaurusDB.convert_from_path(data_file("cellosaurus-excerpt.txt"))
+    assert [profile.slug for profile in db] == [
+        ("BHT-101", "CVCL_1085", "BCRJ"),
+        ("BHT-101", "CVCL_1085", "DSMZ"),
+        ("BHT-101", "CVCL_1085", "PubMed=18713817"),
+        ("FGH", "CVCL_C6A1", "BCRJ"),
+        ("HeLa x mouse hybrid", "CVCL_ZZ99", "ATCC"),
+    ]
+    bcrj, dsmz, pubmed, fgh, hybrid = db
+    assert "vWA" not in bcrj.allele_dict
+    assert dsmz.allele_dict["D8S1179"] == "15"
+    assert pubmed.allele_dict["D8S1179"] == "13,14,15"
+    assert "D21S11" not in fgh.allele_dict
+    assert "synonyms" not in fgh._meta
+    assert hybrid.taxids == [9606, 10090]
+    assert hybrid._meta["organism"] == ["Homo sapiens (Human)", "Mus musculus (Mouse)"]
+
+
+@pytest.mark.parametrize("mode", ["r", "rb"])
+def test_parse_cellosaurus_into_blocks(mode):
+    with open(data_file("cellosaurus-excerpt.txt"), mode) as instream:
+        blocks = list(CellosaurusDB.parse_cellosaurus_into_blocks(instream))
+    assert [block[0] for block in blocks] == [
+        "ID   BHT-101",
+        "ID   FGH",
+        "ID   HeLa x mouse hybrid",
+        "ID   NIH-3T3",
+    ]
+    assert all(isinstance(line, str) for block in blocks for line in block)
+
+
+def test_json_fallback(monkeypatch):
+    db = CellosaurusDB.load(data_file("skhep1-db.json"))
+    json1, json2 = StringIO(), StringIO()
+    db.to_json(json1)
+    monkeypatch.setattr(claspy.db, "orjson", None)
+    db.to_json(json2)
+    assert json1.getvalue() == json2.getvalue()
+    db2 = CellosaurusDB.from_json(StringIO(json2.getvalue()))
+    assert [profile.payload for profile in db2] == [profile.payload for profile in db]
+
+
+def test_db_binary_round_trip(tmp_path):
+    db1 = CellosaurusDB.load(data_file("skhep1-db.json"))
+    db1.save(tmp_path / "db.pickle")
+    db2 = CellosaurusDB.load(tmp_path / "db.pickle")
+    assert isinstance(db2, CellosaurusDB)
+    assert [profile.payload for profile in db2] == [profile.payload for profile in db1]
+    query = next(Profile.load(data_file("mock-sk-hep-1.csv")))
+    summary1 = db1.search(query).summary
+    summary2 = db2.search(query).summary
+    pd.testing.assert_frame_equal(summary1, summary2)
@@ -8,7 +8,13 @@
 # Development Center.
 # -------------------------------------------------------------------------------------------------
 
-from claspy.markers import validate_names
+from claspy.markers import (
+    all_marker_names,
+    marker_ids,
+    standardize_name,
+    valid_names,
+    validate_names,
+)
 import pytest
 
 
@@ -52,3 +58,32 @@ def test_validate_names_mixed_species():
     message = r"list of marker names includes markers from different species: dog, human"
     with pytest.raises(ValueError, match=message):
         validate_names(("vWA", "DogPEZ8"))
+
+
+@pytest.mark.parametrize(
+    "name,expected",
+    [
+        ("pentad", ("Penta D", 9606)),
+        ("DYS391", ("DYS391", 9606)),
+        ("Mouse STR X-1", ("Mouse STR X-1", 10090)),
+        ("dog pez 8", ("Dog PEZ8", 9615)),
+        ("Penta G", (None, None)),
+    ],
+)
+def test_standardize_name(name, expected):
+    assert standardize_name(name) == expected
+
+
+def test_marker_ids():
+    assert len(marker_ids) == len(all_marker_names)
+    for name, marker_id in marker_ids.items():
+        assert all_marker_names[marker_id] == name
+    for names in valid_names.values():
+        for name in names:
+            assert name in marker_ids
+
+
+@pytest.mark.parametrize("taxid", list(valid_names))
+def test_valid_names_unique(taxid):
+    names = valid_names[taxid]
+    assert len(set(names)) == len(names)
@@ -0,0 +1,48 @@
+# -------------------------------------------------------------------------------------------------
+# Copyright (c) 2023, DHS.
+# This file is part of claspy: https://github.com/bioforensics/claspy
+#
+# This software was prepared for the Department of Homeland Security (DHS) by the Battelle National
+# Biodefense Institute, LLC (BNBI) as part of contract HSHQDC-15-C-00064 to manage and operate the
+# National Biodefense Analysis and Countermeasures Center (NBACC), a Federally Funded Research and
+# Development Center.
+# -------------------------------------------------------------------------------------------------
+
+from claspy.db import CellosaurusDB
+from claspy.matrix import ProfileMatrix
+from claspy import Profile
+from claspy.tests import data_file
+import gc
+import pytest
+import weakref
+
+
+@pytest.mark.parametrize("algorithm", ["Tanabe", "query", "reference"])
+@pytest.mark.parametrize("mode", ["intersect", "query", "reference"])
+@pytest.mark.parametrize("amel", [False, True])
+def test_profile_matrix_score(algorithm, mode, amel):
+    db = CellosaurusDB.load(data_file("skhep1-db.json"))
+    query = next(Profile.load(data_file("mock-sk-hep-1.csv")))
+    matrix = ProfileMatrix(db)
+    scores, shared = matrix.score(query, algorithm=algorithm, mode=mode, amel=amel)
+    for reference, score, num_shared_alleles in zip(db, scores, shared):
+        expected = Profile.score(query, reference, algorithm=algorithm, mode=mode, amel=amel)
+        assert score == pytest.approx(expected[0])
+        assert num_shared_alleles == expected[1]
+
+
+def test_profile_matrix_score_cache():
+    db = CellosaurusDB.load(data_file("skhep1-db.json"))
+    query1, query2 = Profile.load(data_file("mock-sk-hep-1-2samples.csv"))
+    assert query1.fingerprint == query2.fingerprint
+    matrix = ProfileMatrix(db)
+    scores1, shared1 = matrix.score(query1)
+    scores2, shared2 = matrix.score(query2)
+    assert scores1 is scores2 and shared1 is shared2
+    assert not scores1.flags.writeable
+    scores3, shared3 = matrix.score(query1, algorithm="query")
+    assert scores3 is not scores1
+    assert len(matrix._cache) == 2
+    matrix = weakref.ref(matrix)
+    gc.collect()
+    assert matrix() is None
@@ -10,7 +10,10 @@
 
 from claspy import Profile
 from claspy.db import CellosaurusDB
+from claspy.matrix import ProfileMatrix
 from claspy.tests import data_file
+import gzip
+from io import StringIO
 import pytest
 
 
@@ -30,10 +33,10 @@ def test_profile_basic(capsys):
     assert len(profile) == 9
     assert next(iter(profile)) == ("CSF1PO", "13")
     assert profile.taxid == 9606
-    profile._meta["taxid"] = [9606, 10116]
-    assert profile.taxid_match(9606) is True
-    assert profile.taxid_match(10116) is True
-    assert profile.taxid_match(10090) is False
+    hybrid = Profile(alleles, {"sample": "sample1", "taxid": [9606, 10116]})
+    assert hybrid.taxid_match(9606) is True
+    assert hybrid.taxid_match("10116") is True
+    assert hybrid.taxid_match(10090) is False
     score, num_shared_alleles = Profile.score(profile, profile)
     assert score == pytest.approx(1.0)
     assert num_shared_alleles == 9
@@ -75,6 +78,7 @@ def test_load_failure_modes(path, message):
         ("7, 8", {"7", "8"}),
         ("10.2,13", {"10.2", "13"}),
         ("11.1", {"11.1"}),
+        ("9.3,\t 10 ", {"9.3", "10"}),
     ],
 )
 def test_parse_allele_string(input, expected):
@@ -150,6 +154,33 @@ def test_score():
     assert num_shared_alleles == 30
 
 
+@pytest.mark.parametrize("mode", ["intersect", "query", "reference"])
+def test_score_no_shared_markers(mode):
+    query = Profile({"CSF1PO": "13,14", "Amelogenin": "X"}, {"sample": "query"})
+    reference = Profile({"TH01": "8", "Amelogenin": "X"}, {"sample": "reference"})
+    assert Profile.score(query, reference, mode=mode) == (0.0, 0)
+    assert Profile.score(query, reference, mode="intersect", amel=True) == (1.0, 1)
+
+
+@pytest.mark.parametrize("mode", ["intersect", "query", "reference"])
+@pytest.mark.parametrize("algorithm", ["Tanabe", "query", "reference"])
+def test_score_many(algorithm, mode):
+    query = next(Profile.load(data_file("mock-cvcl-1085.csv")))
+    references = list(CellosaurusDB.load(path=data_file("skhep1-db.json")))
+    references.append(next(Profile.load(data_file("db-cvcl-1085.csv"))))
+    scores, shared = Profile.score_many(query, references, algorithm=algorithm, mode=mode)
+    assert len(scores) == len(shared) == len(references)
+    for reference, score, num_shared in zip(references, scores, shared):
+        expected = Profile.score(query, reference, algorithm=algorithm, mode=mode)
+        assert (score, num_shared) == pytest.approx(expected)
+    matrix = ProfileMatrix(references)
+    matrix_scores, matrix_shared = Profile.score_many(
+        query, matrix, algorithm=algorithm, mode=mode
+    )
+    assert matrix_scores.tolist() == scores.tolist()
+    assert matrix_shared.tolist() == shared.tolist()
+
+
 @pytest.mark.parametrize(
     "allele_set,expected",
     [
@@ -162,3 +193,49 @@ def test_score():
 )
 def test_allele_repr(allele_set, expected):
     assert Profile.allele_repr(allele_set) == expected
+
+
+@pytest.mark.parametrize("delimiter", [",", "\t", ";"])
+def test_load_delimiters(delimiter):
+    with open(data_file("mock-cvcl-1085.csv"), "r") as instream:
+        table = instream.read().replace(",", delimiter)
+    expected = next(Profile.load(data_file("mock-cvcl-1085.csv")))
+    observed = next(Profile.load(StringIO(table)))
+    assert Profile.sniff_delimiter(StringIO(table)) == delimiter
+    assert observed.allele_dict == expected.allele_dict
+
+
+@pytest.mark.parametrize("delimiter", [",", "\t"])
+def test_load_compressed(delimiter, tmp_path):
+    with open(data_file("mock-sk-hep-1-2samples.csv"), "r") as instream:
+        table = instream.read().replace(",", delimiter)
+    path = tmp_path / "query.csv.gz"
+    with gzip.open(path, "wt") as outstream:
+        outstream.write(table)
+    assert Profile.sniff_delimiter(path) is None
+    expected = list(Profile.load(data_file("mock-sk-hep-1-2samples.csv")))
+    observed = list(Profile.load(path))
+    assert [p.payload for p in observed] == [p.payload for p in expected]
+
+
+def test_table():
+    alleles = {"CSF1PO": "14, 13", "TH01": "9.3", "Amelogenin": "X,Y"}
+    profile = Profile(alleles, {"sample": "sample1"})
+    table = profile.table
+    assert list(table.columns) == ["Sample", "Marker", "Allele1", "Allele2"]
+    assert list(table.Sample) == ["sample1"] * 3
+    assert list(table.Marker) == ["CSF1PO", "TH01", "Amelogenin"]
+    assert list(table.Allele1) == ["13", "9.3", "X"]
+    assert table.Allele2.isna().tolist() == [False, True, False]
+
+
+def test_payload():
+    alleles = {"CSF1PO": "14, 13", "D5S818": "13", "Amelogenin": "X"}
+    profile = Profile(alleles, {"sample": "sample1"})
+    expected = {
+        "meta": {"sample": "sample1"},
+        "alleles": {"CSF1PO": "13,14", "D5S818": "13", "Amelogenin": "X"},
+    }
+    assert profile.payload == expected
+    assert profile.payload is profile.payload
+    assert profile.payload["alleles"] is profile.allele_dict
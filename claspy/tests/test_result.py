@@ -8,6 +8,7 @@
 # Development Center.
 # -------------------------------------------------------------------------------------------------
 from claspy.db import CellosaurusDB
+from claspy.result import CellLineResult, ProfileResult
 from claspy.str_profile import Profile
 from claspy.tests import data_file
 from io import StringIO
@@ -34,7 +35,7 @@ def skhep_result_multi_sample():
 def test_search_result_basic(skhep_result):
     assert skhep_result.maxhits == 5
     assert skhep_result.minscore == pytest.approx(0.9)
-    assert len(skhep_result.results_by_cell_line) == 11
+    assert len(skhep_result.results_by_cell_line) == 5
 
 
 def test_search_result_summary(skhep_result):
@@ -107,3 +108,38 @@ mock_2;SK-HEP-1-Cas9-726;only;0.9615384615384616;25;CCRID;X;11,12;18;8,12;12;13,
 """
 
     assert observed.strip() == expected.strip()
+
+
+def test_cell_line_result_top_score():
+    db = CellosaurusDB.load(data_file("skhep1-db.json"))
+    references = [profile for profile in db if profile.identifier == "SK-HEP-1"]
+    assert len(references) > 1
+    result = CellLineResult()
+    result.append(ProfileResult("mock", 0.9, 20, references[0]))
+    assert result.rank() == (0.9, 20)
+    result.append(ProfileResult("mock", 0.95, 18, references[1]))
+    assert result.rank() == (0.95, 18)
+    result.append(ProfileResult("mock", 0.95, 21, references[0]))
+    result.append(ProfileResult("mock", 0.8, 25, references[1]))
+    assert result.rank() == (0.95, 21)
+    assert result.identifier == "SK-HEP-1"
+    del result[2]
+    assert result.rank() == (0.95, 18)
+    result.extend([ProfileResult("mock", 0.97, 19, references[0])])
+    assert result.rank() == (0.97, 19)
+    result[0] = ProfileResult("mock", 0.99, 22, references[1])
+    assert result.rank() == (0.99, 22)
+    result.pop(0)
+    assert result.rank() == (0.97, 19)
+    result += [ProfileResult("mock", 0.97, 23, references[1])]
+    assert result.rank() == (0.97, 23)
+    result.clear()
+    assert result.rank() == (None, None)
+
+
+def test_search_result_full_report_dtypes(skhep_result):
+    observed = skhep_result.full_report
+    assert observed.Score.dtype == "float64"
+    assert observed.SharedAlleles.dtype == "Int64"
+    assert observed.Source.dtype == "string"
+    assert pd.isna(observed.Score[0]) and pd.isna(observed.SharedAlleles[0])
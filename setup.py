@@ -28,6 +28,7 @@ setup(
     include_package_data=True,
     install_requires=[
         "black==24.3",
+        "numpy",
         "pandas>=2.0",
         "pytest>=6.0",
         "pytest-cov>=3.0",